@@ -4,10 +4,13 @@ import torch.nn as nn
 import numpy as np
 
 import gym
+import copy
 import math
+import inspect
 import time
 import igraph
 from gym import spaces
+from collections import OrderedDict
 
 from metanas.meta_predictor.meta_predictor import MetaPredictor
 import metanas.utils.genotypes as gt
@@ -25,7 +28,8 @@ class NasEnv(gym.Env):
     def __init__(self, config, meta_model,
                  test_phase=False, cell_type="normal",
                  reward_estimation=False,
-                 max_ep_len=100, test_env=None):
+                 max_ep_len=100, test_env=None,
+                 reward_train_steps=1, acc_cache_size=1024):
         super().__init__()
         self.config = config
         self.test_env = test_env
@@ -33,6 +37,7 @@ class NasEnv(gym.Env):
         self.primitives = config.primitives
         self.n_ops = len(config.primitives)
         self.reward_estimation = reward_estimation
+        self.reward_train_steps = reward_train_steps
 
         self.test_phase = test_phase
         self.meta_model = meta_model
@@ -64,6 +69,7 @@ class NasEnv(gym.Env):
         self.A[0, 1] = 0
         self.A[1, 0] = 0
 
+        self._build_index()
         self.initialize_observation_space()
 
         # Initialize action space
@@ -71,16 +77,52 @@ class NasEnv(gym.Env):
         action_size = len(self.A) + 2*len(self. primitives) + 1
         self.action_space = spaces.Discrete(action_size)
 
+        # Action boundaries, to dispatch actions without allocating
+        # ranges on every step
+        self._nA = len(self.A)
+        self._nO = len(self.primitives)
+        self._bounds = (self._nA,
+                        self._nA + self._nO,
+                        self._nA + 2*self._nO,
+                        self._nA + 2*self._nO + 1)
+
         # TODO: Store best alphas/or model obtained yet,
         self.max_alphas = []
         self.max_acc = 0.0
 
-        # weights optimizer
+        # Random rewards of the testing env
+        self._rng = np.random.RandomState(self.config.seed)
+
+        # Constant of the inverse softmax when mutating alphas
+        self._log10 = math.log(10.)
+
+        # Device buffers for the task batches of the reward estimation
+        self._device_buffers = {}
+
+        # Predictor input of the current task
+        self._cached_predictor_dataset = None
+
+        # Snapshot of the weights warmed up on the current task
+        self._w_snapshot = None
+        self._w_optim_snapshot = None
+
+        # LRU cache of the accuracies of visited alphas on the current
+        # task, keyed by the raw alpha bytes
+        self._acc_cache = OrderedDict()
+        self._acc_cache_size = acc_cache_size
+
+        # weights optimizer, using the multi-tensor (foreach) update
+        # over all weights if supported by the PyTorch version
+        adam_kwargs = {}
+        if "foreach" in inspect.signature(torch.optim.Adam).parameters:
+            adam_kwargs["foreach"] = True
+
         self.w_optim = torch.optim.Adam(
             self.meta_model.weights(),
             lr=self.config.w_lr,
             betas=(0.0, 0.999),
             weight_decay=self.config.w_weight_decay,
+            **adam_kwargs
         )
 
     def reset(self):
@@ -111,6 +153,17 @@ class NasEnv(gym.Env):
         print("Set new task for environment")
         self.current_task = task
         self.meta_state = meta_state
+        self._acc_cache.clear()
+
+        # Train the weights on the task once, the DARTS reward
+        # estimation continues from this snapshot
+        if self.test_env is None and not self.reward_estimation:
+            self.meta_model.load_state_dict(self.meta_state)
+            self._warmup_weights(task)
+
+        # The dataset for the predictor is the same for all rewards
+        if self.test_env is None and self.reward_estimation:
+            self._cached_predictor_dataset = self._predictor_dataset(task)
 
         self.reset()
 
@@ -118,9 +171,7 @@ class NasEnv(gym.Env):
         self.max_acc = 0.0
 
         # TODO: Check celltype
-        self.max_alphas = []
-        for _, row in enumerate(self.meta_model.alpha_normal):
-            self.max_alphas.append(row)
+        self.max_alphas = self._snapshot_alphas()
 
     def initialize_observation_space(self):
         # Generate the internal states of the graph
@@ -134,6 +185,50 @@ class NasEnv(gym.Env):
             shape=self.current_state.shape,
             dtype=np.int32)
 
+    def _build_index(self):
+        """Build the edge lookup tables and the constant part of the
+        states, which only depend on the shapes of the alphas.
+        """
+        self._row_sizes = [
+            len(alpha) for alpha in self.meta_model.alpha_normal]
+        self._row_offsets = np.cumsum([0] + self._row_sizes[:-1])
+        n_ops = self.meta_model.alpha_normal[0].shape[-1]
+
+        # Lookup tables indexed by [cur_node, next_node], -1 for nodes
+        # which do not share an edge
+        self.edge_to_index = -np.ones(
+            (self.n_nodes, self.n_nodes), dtype=np.int32)
+        self.edge_to_alpha = -np.ones(
+            (self.n_nodes, self.n_nodes, 2), dtype=np.int32)
+
+        s_idx = 0
+        for i, n_row_edges in enumerate(self._row_sizes):
+            for j in range(n_row_edges):
+                self.edge_to_index[j, i+2] = s_idx
+                self.edge_to_index[i+2, j] = s_idx+1
+
+                self.edge_to_alpha[j, i+2] = (i, j)
+                self.edge_to_alpha[i+2, j] = (i, j)
+                s_idx += 2
+
+        # Edge j -> node i+2 for every row i, rows hold i+2 edges
+        node_indices = np.repeat(
+            np.arange(len(self._row_sizes)) + 2, self._row_sizes)
+        edge_indices = np.concatenate([
+            np.arange(n_row_edges) for n_row_edges in self._row_sizes])
+        n_edges = len(edge_indices)
+
+        # For undirected edge we add the edge twice, (j, i+2) on the
+        # even and (i+2, j) on the odd states
+        self._state_template = np.zeros(
+            (2*n_edges, 3 + self.n_nodes + n_ops), dtype=np.float32)
+        self._state_template[0::2, 0] = edge_indices
+        self._state_template[0::2, 1] = node_indices
+        self._state_template[0::2, 3:3+self.n_nodes] = self.A[node_indices]
+        self._state_template[1::2, 0] = node_indices
+        self._state_template[1::2, 1] = edge_indices
+        self._state_template[1::2, 3:3+self.n_nodes] = self.A[edge_indices]
+
     def update_states(self):
         """Set all the state variables for the environment on
         reset and updates.
@@ -141,106 +236,95 @@ class NasEnv(gym.Env):
         Raises:
             RuntimeError: On passing invalid cell types
         """
-        s_idx = 0
-        self.states = []
-        self.edge_to_index = {}
-        self.edge_to_alpha = {}
-
         # Define (normalized) alphas
         if self.cell_type == "normal":
-            # Idea of letting RL observe the normalized alphas,
-            # and mutate the actual alpha values
-            self.normalized_alphas = [
-                F.softmax(alpha, dim=-1).detach().cpu()
-                for alpha in self.meta_model.alpha_normal]
-
-            self.alphas = [
-                alpha.detach().cpu()
-                for alpha in self.meta_model.alpha_normal]
-
+            cell_alphas = self.meta_model.alpha_normal
         elif self.cell_type == "reduce":
-            self.normalized_alphas = [
-                F.softmax(alpha, dim=-1).detach().cpu()
-                for alpha in self.meta_model.alpha_reduce]
-
-            self.alphas = [
-                alpha.detach().cpu()
-                for alpha in self.meta_model.alpha_reduce]
-
+            cell_alphas = self.meta_model.alpha_reduce
         else:
             raise RuntimeError(f"Cell type {self.cell_type} is not supported.")
 
-        for i, edges in enumerate(self.normalized_alphas):
-            # edges: Tensor(n_edges, n_ops)
-            edge_max, _ = torch.topk(edges[:, :], 1)
-            # selecting the top-k input nodes, k=2
-            _, topk_edge_indices = torch.topk(edge_max.view(-1), k=2)
-
-            for j, edge in enumerate(edges):
-                self.edge_to_index[(j, i+2)] = s_idx
-                self.edge_to_index[(i+2, j)] = s_idx+1
-
-                self.edge_to_alpha[(j, i+2)] = (i, j)
-                self.edge_to_alpha[(i+2, j)] = (i, j)
-
-                # For undirected edge we add the edge twice
-                self.states.append(
-                    np.concatenate((
-                        [j],
-                        [i+2],
-                        [int(j in topk_edge_indices)],
-                        self.A[i+2],
-                        edge.detach().numpy())))
-
-                self.states.append(
-                    np.concatenate((
-                        [i+2],
-                        [j],
-                        [int(j in topk_edge_indices)],
-                        self.A[j],
-                        edge.detach().numpy())))
-                s_idx += 2
+        # Idea of letting RL observe the normalized alphas,
+        # and mutate the actual alpha values. The rows are normalized
+        # on the device of the meta-model and copied to host at once.
+        alphas = torch.cat([alpha.detach() for alpha in cell_alphas])
+        alphas = torch.stack((alphas, F.softmax(alphas, dim=-1))).cpu()
+
+        self.alphas = list(alphas[0].split(self._row_sizes))
+        self.normalized_alphas = list(alphas[1].split(self._row_sizes))
+
+        # Selecting the top-k input nodes, k=2, of all rows at once.
+        # The edges are ranked by their normalized maximum, padded
+        # edges are never selected.
+        edge_max = nn.utils.rnn.pad_sequence(
+            self.normalized_alphas, batch_first=True,
+            padding_value=-math.inf).max(dim=-1).values
+        topk_edge_indices = edge_max.topk(2, dim=-1).indices.numpy()
+
+        is_topk = np.zeros(len(alphas[1]))
+        is_topk[(self._row_offsets[:, None] + topk_edge_indices).ravel()] = 1
+
+        self.states = self._state_template.copy()
+        self.states[:, 2] = np.repeat(is_topk, 2)
+        self.states[:, 3+self.n_nodes:] = np.repeat(
+            alphas[1].numpy(), 2, axis=0)
+
+    def _refresh_alphas(self, row_idx):
+        """Recompute the normalized alphas of a single mutated row and
+        patch its states in place, instead of rebuilding all states.
+        """
+        alpha = self.meta_model.alpha_normal[row_idx]
+        self.normalized_alphas[row_idx] = F.softmax(
+            alpha, dim=-1).detach().cpu()
+        self.alphas[row_idx] = alpha.detach().cpu()
+
+        edges = self.normalized_alphas[row_idx]
+        topk_edge_indices = edges.max(dim=-1).values.topk(2).indices
+
+        # The top-k input nodes may change with a single edge, so
+        # patch every state of the row, which are stored consecutively
+        is_topk = np.zeros(len(edges))
+        is_topk[topk_edge_indices.numpy()] = 1
 
-        self.states = np.array(self.states)
+        start = 2*self._row_offsets[row_idx]
+        end = start + 2*len(edges)
+        self.states[start:end, 2] = np.repeat(is_topk, 2)
+        self.states[start:end, 3+self.n_nodes:] = np.repeat(
+            edges.numpy(), 2, axis=0)
 
     def set_start_state(self):
         # TODO: Add probability to the starting edge?
         self.current_state_index = 0
         self.current_state = self.states[
-            self.current_state_index]
+            self.current_state_index].copy()
 
     # Methods to increase alphas
-    def _inverse_softmax(self, x, C):
-        return torch.log(x) + C
-
     def increase_op(self, row_idx, edge_idx, op_idx, prob=0.3):
-        C = math.log(10.)
-
         # Set short-hands
         curr_op = self.normalized_alphas[row_idx][edge_idx][op_idx]
         curr_edge = self.normalized_alphas[row_idx][edge_idx]
 
+        # Compare on a Python scalar instead of tensor ops
+        curr_prob = curr_op.item()
+
         # Allow for increasing to 0.99
-        if curr_op + prob > 1.0:
-            surplus = curr_op + prob - 0.99
+        if curr_prob + prob > 1.0:
+            surplus = curr_prob + prob - 0.99
             prob -= surplus
 
-        if curr_op + prob < 1.0:
-            # Increase chosen op
-            with torch.no_grad():
-                curr_op += prob
+        if curr_prob + prob < 1.0:
+            # Increase chosen op, the normalized alphas are detached
+            # so no autograd context is needed
+            curr_op += prob
 
             # Prevent 0.00 normalized alpha values, resulting in
             # -inf
-            with torch.no_grad():
-                curr_edge += 0.01
+            curr_edge += 0.01
 
-            # Set the meta-model, update the env state in
-            # self.update_states()
-            with torch.no_grad():
-                self.meta_model.alpha_normal[
-                    row_idx][edge_idx] = self._inverse_softmax(
-                    curr_edge, C)
+            # Set the meta-model by the inverse softmax, through .data
+            # to bypass autograd
+            self.meta_model.alpha_normal[row_idx].data[
+                edge_idx] = torch.log(curr_edge) + self._log10
 
             # True if state is mutated
             return True
@@ -248,31 +332,31 @@ class NasEnv(gym.Env):
         return False
 
     def decrease_op(self, row_idx, edge_idx, op_idx, prob=0.3):
-        C = math.log(10.)
-
         # Set short-hands
         curr_op = self.normalized_alphas[row_idx][edge_idx][op_idx]
         curr_edge = self.normalized_alphas[row_idx][edge_idx]
 
+        # Compare on a Python scalar instead of tensor ops
+        curr_prob = curr_op.item()
+
         # Allow for increasing to 0.99
-        if curr_op - prob < 0.0:
-            surplus = prob - curr_op + 0.01
+        if curr_prob - prob < 0.0:
+            surplus = prob - curr_prob + 0.01
             prob -= surplus
 
-        if curr_op - prob > 0.0:
-            # Increase chosen op
-            with torch.no_grad():
-                curr_op -= prob
+        if curr_prob - prob > 0.0:
+            # Decrease chosen op, the normalized alphas are detached
+            # so no autograd context is needed
+            curr_op -= prob
 
             # Prevent 0.00 normalized alpha values, resulting in
             # -inf
-            with torch.no_grad():
-                curr_edge += 0.01
+            curr_edge += 0.01
 
-            with torch.no_grad():
-                self.meta_model.alpha_normal[
-                    row_idx][edge_idx] = self._inverse_softmax(
-                    curr_edge, C)
+            # Set the meta-model by the inverse softmax, through .data
+            # to bypass autograd
+            self.meta_model.alpha_normal[row_idx].data[
+                edge_idx] = torch.log(curr_edge) + self._log10
 
             # True if state is mutated
             return True
@@ -306,6 +390,14 @@ class NasEnv(gym.Env):
         for row in self.states:
             print(row)
 
+    def _snapshot_alphas(self):
+        """Copy all alpha rows of the meta-model with a single
+        concatenation on its device, returned as views per row.
+        """
+        alphas = torch.cat(
+            [alpha.detach() for alpha in self.meta_model.alpha_normal])
+        return list(alphas.split(self._row_sizes))
+
     def get_max_alphas(self):
         return self.max_alphas
 
@@ -314,7 +406,7 @@ class NasEnv(gym.Env):
 
         # cur_node = int(self.current_state[0])
         # next_node = int(self.current_state[1])
-        # row_idx, edge_idx = self.edge_to_alpha[(cur_node, next_node)]
+        # row_idx, edge_idx = self.edge_to_alpha[cur_node, next_node]
         # norm_a1 = F.softmax(
         #     self.meta_model.alpha_normal[row_idx][edge_idx], dim=-1).detach().cpu()
 
@@ -328,9 +420,7 @@ class NasEnv(gym.Env):
                 self.max_acc = acc
 
                 # TODO: Check celltype
-                self.max_alphas = []
-                for _, row in enumerate(self.meta_model.alpha_normal):
-                    self.max_alphas.append(row.to(self.config.device))
+                self.max_alphas = self._snapshot_alphas()
 
         # The final step time
         end = time.time()
@@ -376,8 +466,10 @@ class NasEnv(gym.Env):
         cur_node = int(self.current_state[0])
         next_node = int(self.current_state[1])
 
+        move_end, increase_end, decrease_end, terminate_end = self._bounds
+
         # Adjacancy matrix A, navigating to the next node
-        if action in np.arange(len(self.A)):
+        if 0 <= action < move_end:
 
             # Determine if agent is allowed to traverse
             # the edge
@@ -386,8 +478,8 @@ class NasEnv(gym.Env):
                 cur_node = next_node
                 next_node = action
 
-                s_idx = self.edge_to_index[(cur_node, next_node)]
-                self.current_state = self.states[s_idx]
+                s_idx = self.edge_to_index[cur_node, next_node]
+                self.current_state = self.states[s_idx].copy()
 
                 action_info = f"Legal move from {cur_node} to {action}"
 
@@ -399,14 +491,13 @@ class NasEnv(gym.Env):
                 action_info = f"Illegal move from {cur_node} to {action}"
 
         # Increasing the alpha for the given operation
-        if action in np.arange(len(self.A),
-                               len(self.A)+len(self.primitives)):
+        elif move_end <= action < increase_end:
             # Adjust action indices to fit the operations
-            action = action - len(self.A)
+            action = action - move_end
 
             # Find the current edge to mutate
-            row_idx, edge_idx = self.edge_to_alpha[(cur_node, next_node)]
-            s_idx = self.edge_to_index[(cur_node, next_node)]
+            row_idx, edge_idx = self.edge_to_alpha[cur_node, next_node]
+            s_idx = self.edge_to_index[cur_node, next_node]
 
             # True = increase
             update = self.update_meta_model(True,
@@ -415,11 +506,12 @@ class NasEnv(gym.Env):
                                             action)
 
             if update:
-                # Update the local state after increasing the alphas
-                self.update_states()
+                # Only patch the states of the mutated row, the
+                # index of the states does not change
+                self._refresh_alphas(row_idx)
 
-            # Set current state again!
-            self.current_state = self.states[s_idx]
+                # Set current state again!
+                self.current_state = self.states[s_idx].copy()
 
             # Compute reward after updating
             reward, acc = self.compute_reward()
@@ -427,14 +519,13 @@ class NasEnv(gym.Env):
             action_info = f"Increase alpha ({row_idx}, {edge_idx}, {action})"
 
         # Decreasing the alpha for the given operation
-        if action in np.arange(len(self.A)+len(self.primitives),
-                               len(self.A)+2*len(self.primitives)):
+        elif increase_end <= action < decrease_end:
             # Adjust action indices to fit the operations
-            action = action - len(self.A) - len(self.primitives)
+            action = action - increase_end
 
             # Find the current edge to mutate
-            row_idx, edge_idx = self.edge_to_alpha[(cur_node, next_node)]
-            s_idx = self.edge_to_index[(cur_node, next_node)]
+            row_idx, edge_idx = self.edge_to_alpha[cur_node, next_node]
+            s_idx = self.edge_to_index[cur_node, next_node]
 
             # False = decrease
             update = self.update_meta_model(False,
@@ -443,11 +534,12 @@ class NasEnv(gym.Env):
                                             action)
 
             if update:
-                # Update the local state after increasing the alphas
-                self.update_states()
+                # Only patch the states of the mutated row, the
+                # index of the states does not change
+                self._refresh_alphas(row_idx)
 
-            # Set current state again!
-            self.current_state = self.states[s_idx]
+                # Set current state again!
+                self.current_state = self.states[s_idx].copy()
 
             # Compute reward after updating
             reward, acc = self.compute_reward()
@@ -455,9 +547,7 @@ class NasEnv(gym.Env):
             action_info = f"Decrease alpha ({row_idx}, {edge_idx}, {action})"
 
         # Terminate the episode
-        if action in np.arange(len(self.A)+2*len(self.primitives),
-                               len(self.A)+2*len(self.primitives)+1,
-                               ):
+        elif decrease_end <= action < terminate_end:
             self.terminate_episode = True
             action_info = f"Terminate the episode at step {self.step_count}"
 
@@ -467,12 +557,23 @@ class NasEnv(gym.Env):
         # Calculation/Estimations of the reward
         # For testing env
         if self.test_env is not None:
-            return np.random.uniform(low=-1, high=1, size=(1,))[0]
+            return self._rng.uniform(low=-1, high=1), None
 
-        if self.reward_estimation:
-            acc = self._meta_predictor_estimation(self.current_task)
+        # Revisited alphas reuse the accuracy estimated before
+        key = torch.cat(self.alphas).numpy().tobytes()
+        acc = self._acc_cache.get(key)
+
+        if acc is not None:
+            self._acc_cache.move_to_end(key)
         else:
-            acc = self._darts_estimation(self.current_task)
+            if self.reward_estimation:
+                acc = self._meta_predictor_estimation(self.current_task)
+            else:
+                acc = self._darts_estimation(self.current_task)
+
+            self._acc_cache[key] = acc
+            if len(self._acc_cache) > self._acc_cache_size:
+                self._acc_cache.popitem(last=False)
 
         # Scale reward to (-1, 1) range
         reward = self.scale_reward(acc)
@@ -513,22 +614,41 @@ class NasEnv(gym.Env):
 
         return reward
 
-    def _darts_estimation(self, task):
-        # First train the weights with few steps on current batch
+    def _train_weights_step(self, train_X, train_y):
+        train_X = self._to_device_buffer("train_X", train_X)
+        train_y = self._to_device_buffer("train_y", train_y)
+
+        self.w_optim.zero_grad()
+        logits = self.meta_model(train_X)
+
+        loss = self.meta_model.criterion(logits, train_y)
+        loss.backward()
+        nn.utils.clip_grad_norm_(self.meta_model.weights(),
+                                 self.config.w_grad_clip)
+        self.w_optim.step()
+
+    def _warmup_weights(self, task):
+        """Train the weights for a full pass over the task and store
+        the weights and optimizer state for the reward estimation"""
         self.meta_model.train()
 
         for _, (train_X, train_y) in enumerate(task.train_loader):
-            train_X, train_y = train_X.to(
-                self.config.device), train_y.to(self.config.device)
+            self._train_weights_step(train_X, train_y)
+
+        self._w_snapshot = copy.deepcopy(self.meta_model.net.state_dict())
+        self._w_optim_snapshot = copy.deepcopy(self.w_optim.state_dict())
 
-            self.w_optim.zero_grad()
-            logits = self.meta_model(train_X)
+    def _darts_estimation(self, task):
+        # Restore the warmed up weights, leaving the alphas intact, and
+        # only train the weights for few steps on the current alphas
+        self.meta_model.net.load_state_dict(self._w_snapshot)
+        self.w_optim.load_state_dict(self._w_optim_snapshot)
+        self.meta_model.train()
 
-            loss = self.meta_model.criterion(logits, train_y)
-            loss.backward()
-            nn.utils.clip_grad_norm_(self.meta_model.weights(),
-                                     self.config.w_grad_clip)
-            self.w_optim.step()
+        for step, (train_X, train_y) in enumerate(task.train_loader):
+            if step == self.reward_train_steps:
+                break
+            self._train_weights_step(train_X, train_y)
 
         for batch_idx, batch in enumerate(task.test_loader):
             x_test, y_test = batch
@@ -544,10 +664,46 @@ class NasEnv(gym.Env):
         reward = prec1.item()
         return reward
 
+    def _to_device_buffer(self, name, tensor):
+        """Copy a batch into a persistent device buffer, which is only
+        reallocated when the shape of the batches changes.
+        """
+        buffer = self._device_buffers.get(name)
+        if buffer is None or buffer.shape != tensor.shape or \
+                buffer.dtype != tensor.dtype:
+            buffer = torch.empty_like(tensor, device=self.config.device)
+            self._device_buffers[name] = buffer
+
+        return buffer.copy_(tensor, non_blocking=True)
+
+    def _predictor_dataset(self, task):
+        """The task dataset in the input format of the meta predictor,
+        which is computed once per task in set_task
+        """
+        # Get num_samples, n_train * k
+        # TODO: Should be testing dataset?
+        train_y, _ = next(iter(task.train_loader))
+        assert train_y.shape[0] == self.config.num_samples, "Number of samples should equal training of meta_predictor"
+
+        # TODO: Double check paper (32x32)
+        dataset = F.interpolate(train_y, size=(32, 16)).view(-1, 512)
+        return dataset.to(self.config.device)
+
     def _meta_predictor_estimation(self, task):
+        graph = self._alphas_to_graph(self.normalized_alphas)
+
+        y_pred = self.meta_predictor.evaluate_architecture(
+            self._cached_predictor_dataset, graph
+        )
+        print(y_pred.item())
+        return y_pred.item()
 
+    def _alphas_to_graph(self, normalized_alphas):
+        """Convert the normalized alphas to the graph of the meta
+        predictor
+        """
         # TODO: Use genotype function from meta_model possibly
-        geno = parse(self.normalized_alphas, k=2,
+        geno = parse(normalized_alphas, k=2,
                      primitives=gt.PRIMITIVES_NAS_BENCH_201)
 
         # Convert genotype to graph
@@ -581,20 +737,7 @@ class NasEnv(gym.Env):
         edges.append(stop_node)
 
         graph, _ = decode_metad2a_to_igraph(edges)
-
-        # Get num_samples, n_train * k
-        # TODO: Should be testing dataset?
-        train_y, _ = next(iter(task.train_loader))
-        assert train_y.shape[0] == self.config.num_samples, "Number of samples should equal training of meta_predictor"
-
-        # TODO: Double check paper (32x32)
-        dataset = F.interpolate(train_y, size=(32, 16)).view(-1, 512)
-
-        y_pred = self.meta_predictor.evaluate_architecture(
-            dataset, graph
-        )
-        print(y_pred.item())
-        return y_pred.item()
+        return graph
 
 
 def decode_metad2a_to_igraph(row):
@@ -602,35 +745,35 @@ def decode_metad2a_to_igraph(row):
         row = eval(row)
     n = len(row)
 
-    g = igraph.Graph(directed=True)
-    g.add_vertices(n)
-
+    # Collect the edges first to construct the graph in a single call
+    edges = []
     for i, node in enumerate(row):
-        g.vs[i]['type'] = node[0]
-
         if i < (n - 2) and i > 0:
-            g.add_edge(i, i + 1)  # always connect from last node
+            edges.append((i, i + 1))  # always connect from last node
         for j, edge in enumerate(node[1:]):
             if edge == 1:
-                g.add_edge(j, i)
+                edges.append((j, i))
+
+    g = igraph.Graph(n=n, edges=edges, directed=True)
+    g.vs['type'] = [node[0] for node in row]
     return g, n
 
 
 def parse(alpha, k, primitives=gt.PRIMITIVES_NAS_BENCH_201):
-    gene = []
-    for edges in alpha:
-        edge_max, primitive_indices = torch.topk(
-            edges[:, :], 1
-        )
+    # Pad the ragged rows to select the top-k edges of all rows at
+    # once, the padded edges are never selected
+    edges = nn.utils.rnn.pad_sequence(
+        alpha, batch_first=True, padding_value=-math.inf)
 
-        topk_edge_values, topk_edge_indices = torch.topk(
-            edge_max.view(-1), k)
-
-        node_gene = []
-        for edge_idx in topk_edge_indices:
-            prim_idx = primitive_indices[edge_idx]
-            prim = primitives[prim_idx]
-            node_gene.append((prim, edge_idx.item()))
+    edge_max, primitive_indices = edges.max(dim=-1)
+    _, topk_edge_indices = edge_max.topk(k, dim=-1)
+    topk_primitive_indices = primitive_indices.gather(-1, topk_edge_indices)
 
+    gene = []
+    for edge_indices, prim_indices in zip(topk_edge_indices.tolist(),
+                                          topk_primitive_indices.tolist()):
+        node_gene = [(primitives[prim_idx], edge_idx)
+                     for edge_idx, prim_idx in zip(edge_indices,
+                                                   prim_indices)]
         gene.append(node_gene)
     return gene
@@ -53,15 +53,16 @@ def decode_NAS_BENCH_201_8_to_igraph(row):
     if isinstance(row, str):
         row = eval(row)  # convert string to list of lists
     n = len(row)
-    g = igraph.Graph(directed=True)
-    g.add_vertices(n)
+    # construct the graph from the complete edge list in a single call
+    edges = []
     for i, node in enumerate(row):
-        g.vs[i]['type'] = node[0]
         if i < (n - 2) and i > 0:
-            g.add_edge(i, i + 1)  # always connect from last node
+            edges.append((i, i + 1))  # always connect from last node
         for j, edge in enumerate(node[1:]):
             if edge == 1:
-                g.add_edge(j, i)
+                edges.append((j, i))
+    g = igraph.Graph(n=n, edges=edges, directed=True)
+    g.vs['type'] = [node[0] for node in row]
     return g, n
 
 
@@ -822,6 +822,13 @@ if __name__ == "__main__":
     )
     parser.add_argument("--dataset", default="omniglot",
                         help="omniglot / miniimagenet")
+    parser.add_argument(
+        "--prefetch_meta_batches",
+        type=int,
+        default=0,
+        help="Requires the torchmeta data loading. Number of meta batches "
+        "assembled ahead in a background thread, 0 disables prefetching.",
+    )
 
     parser.add_argument(
         "--use_vinyals_split",
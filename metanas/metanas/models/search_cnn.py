@@ -213,11 +213,20 @@ class SearchCNNController(nn.Module):
     def apply_normalizer(self, alpha):
         return self.normalizer["func"](alpha, self.normalizer["params"])
 
+    def apply_normalizer_rows(self, alphas):
+        """Apply the normalizer to all rows of operation alphas at once
+
+        The rows (i + 2, n_ops) differ in length, so they are concatenated
+        over the edges, normalized over the operations in a single call
+        and split into views per row again.
+        """
+        row_sizes = [len(alpha) for alpha in alphas]
+        return list(self.apply_normalizer(
+            torch.cat(list(alphas))).split(row_sizes))
+
     def _get_normalized_alphas(self):
-        weights_normal = [self.apply_normalizer(
-            alpha) for alpha in self.alpha_normal]
-        weights_reduce = [self.apply_normalizer(
-            alpha) for alpha in self.alpha_reduce]
+        weights_normal = self.apply_normalizer_rows(self.alpha_normal)
+        weights_reduce = self.apply_normalizer_rows(self.alpha_reduce)
 
         weights_pw_normal = None
         weights_pw_reduce = None
@@ -279,10 +288,8 @@ class SearchCNNController(nn.Module):
                 self.normalizer["params"]["max_steps"] - 1
             )
 
-        weights_normal = [self.apply_normalizer(
-            alpha) for alpha in self.alpha_normal]
-        weights_reduce = [self.apply_normalizer(
-            alpha) for alpha in self.alpha_reduce]
+        weights_normal = self.apply_normalizer_rows(self.alpha_normal)
+        weights_reduce = self.apply_normalizer_rows(self.alpha_reduce)
         for idx in range(len(weights_normal)):
             # need to modify data because alphas are leaf variables
             self.alpha_normal[idx].data[weights_normal[idx]
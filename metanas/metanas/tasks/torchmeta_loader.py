@@ -1,4 +1,8 @@
 
+import queue
+import threading
+
+import torch
 from torch.utils.data import DataLoader, RandomSampler, TensorDataset
 from torchmeta.datasets import Omniglot
 from torchmeta.transforms import Categorical, ClassSplitter, Rotation
@@ -49,6 +53,9 @@ def sample_meta_batch(
     test_batch_x, test_batch_y = batch["test"]
     num_tasks = meta_batch_size
 
+    # Pinned batches allow for asynchronous host to device copies
+    pin_memory = torch.cuda.is_available()
+
     meta_train_batch = list()
     for task_idx in range(num_tasks):
         dset_train = TensorDataset(
@@ -56,9 +63,11 @@ def sample_meta_batch(
         dset_val = TensorDataset(
             test_batch_x[task_idx], test_batch_y[task_idx])
         train_loader = DataLoader(
-            dset_train, batch_size=task_batch_size, sampler=task_train_sampler
+            dset_train, batch_size=task_batch_size, sampler=task_train_sampler,
+            pin_memory=pin_memory
         )
-        test_loader = DataLoader(dset_val, batch_size=shots * ways)
+        test_loader = DataLoader(
+            dset_val, batch_size=shots * ways, pin_memory=pin_memory)
         meta_train_batch.append(Task(train_loader, train_loader, test_loader))
     return meta_train_batch
 
@@ -195,11 +204,13 @@ def create_triplemnist_data_loader(
         A torchmeta :class:`BatchMetaDataLoader` object.
     """
 
+    # torchmeta decodes the images as RGB, convert them to a single
+    # channel first, so that Resize only processes one channel
     dataset = triplemnist(
         root,
         n_shot,
         k_way,
-        transform=Compose([Resize(input_size), Grayscale(1), ToTensor()]),
+        transform=Compose([Grayscale(1), Resize(input_size), ToTensor()]),
         meta_split=meta_split,
         test_shots=n_query,
         download=download,
@@ -212,6 +223,44 @@ def create_triplemnist_data_loader(
     return dataloader
 
 
+class MetaPrefetchLoader:
+    """Iterate a meta data loader in a background thread
+
+    The thread assembles the next meta batches while the current one is
+    used for training, at most `prefetch` batches are kept in the queue.
+    Exceptions of the wrapped loader, including the end of iteration, are
+    raised on the consuming side.
+    """
+
+    def __init__(self, loader, prefetch=2):
+        self._queue = queue.Queue(maxsize=prefetch)
+        self._error = None
+        self._thread = threading.Thread(
+            target=self._fill, args=(iter(loader),), daemon=True)
+        self._thread.start()
+
+    def _fill(self, batch_iter):
+        try:
+            for batch in batch_iter:
+                self._queue.put((batch, None))
+            self._queue.put((None, StopIteration()))
+        except Exception as e:
+            self._queue.put((None, e))
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        # the thread puts the terminal item only once, keep raising it
+        if self._error is not None:
+            raise self._error
+        batch, error = self._queue.get()
+        if error is not None:
+            self._error = error
+            raise error
+        return batch
+
+
 class TorchmetaTaskDistribution(TaskDistribution):
     """Class to create tasks for meta learning using torchmeta data loaders"""
 
@@ -239,6 +288,14 @@ class TorchmetaTaskDistribution(TaskDistribution):
         self.test_it = None
         self.test_sampler = None
         self.seed = config.seed
+        self.prefetch_meta_batches = config.prefetch_meta_batches
+
+    def _iter_loader(self, loader):
+        """Iterator over the meta batches of the loader, prefetched in a
+        background thread if enabled"""
+        if self.prefetch_meta_batches > 0:
+            return MetaPrefetchLoader(loader, self.prefetch_meta_batches)
+        return iter(loader)
 
     def sample_meta_train(self):
         return sample_meta_batch(
@@ -288,7 +345,7 @@ class OmniglotFewShot(TorchmetaTaskDistribution):
             self.use_vinyals_split,
             seed=self.seed
         )
-        self.train_it = iter(self.train_loader)
+        self.train_it = self._iter_loader(self.train_loader)
 
         if self.use_vinyals_split:
             self.val_loader = create_og_data_loader(
@@ -304,7 +361,7 @@ class OmniglotFewShot(TorchmetaTaskDistribution):
                 self.use_vinyals_split,
                 seed=self.seed
             )
-            self.val_it = iter(self.val_loader)
+            self.val_it = self._iter_loader(self.val_loader)
 
         self.test_loader = create_og_data_loader(
             self.data_path,
@@ -319,7 +376,7 @@ class OmniglotFewShot(TorchmetaTaskDistribution):
             self.use_vinyals_split,
             seed=self.seed
         )
-        self.test_it = iter(self.test_loader)
+        self.test_it = self._iter_loader(self.test_loader)
 
         self.train_sampler = None
         if self.task_batch_size != self.n_shot_train * self.k_way:
@@ -360,7 +417,7 @@ class MiniImageNetFewShot(TorchmetaTaskDistribution):
             self.download,
             seed=self.seed,
         )
-        self.train_it = iter(self.train_loader)
+        self.train_it = self._iter_loader(self.train_loader)
 
         self.val_loader = create_miniimagenet_data_loader(
             self.data_path,
@@ -373,7 +430,7 @@ class MiniImageNetFewShot(TorchmetaTaskDistribution):
             self.download,
             seed=self.seed,
         )
-        self.val_it = iter(self.val_loader)
+        self.val_it = self._iter_loader(self.val_loader)
 
         self.test_loader = create_miniimagenet_data_loader(
             self.data_path,
@@ -386,7 +443,7 @@ class MiniImageNetFewShot(TorchmetaTaskDistribution):
             self.download,
             seed=self.seed,
         )
-        self.test_it = iter(self.test_loader)
+        self.test_it = self._iter_loader(self.test_loader)
 
         self.train_sampler = None
         if self.task_batch_size != self.n_shot_train * self.k_way:
@@ -429,7 +486,7 @@ class TripleMNISTFewShot(TorchmetaTaskDistribution):
             self.download,
             seed=self.seed,
         )
-        self.train_it = iter(self.train_loader)
+        self.train_it = self._iter_loader(self.train_loader)
 
         self.val_loader = create_triplemnist_data_loader(
             self.data_path,
@@ -443,7 +500,7 @@ class TripleMNISTFewShot(TorchmetaTaskDistribution):
             self.download,
             seed=self.seed,
         )
-        self.val_it = iter(self.val_loader)
+        self.val_it = self._iter_loader(self.val_loader)
 
         self.test_loader = create_triplemnist_data_loader(
             self.data_path,
@@ -457,7 +514,7 @@ class TripleMNISTFewShot(TorchmetaTaskDistribution):
             self.download,
             seed=self.seed,
         )
-        self.test_it = iter(self.test_loader)
+        self.test_it = self._iter_loader(self.test_loader)
 
         self.train_sampler = None
         if self.task_batch_size != self.n_shot_train * self.k_way:
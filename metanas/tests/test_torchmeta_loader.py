@@ -0,0 +1,32 @@
+from metanas.tasks.torchmeta_loader import MetaPrefetchLoader
+import unittest
+
+
+class FailingLoader:
+
+    def __iter__(self):
+        yield 0
+        raise RuntimeError("loader failed")
+
+
+class TestMetaPrefetchLoader(unittest.TestCase):
+
+    def test_exhausted_keeps_raising(self):
+        loader = MetaPrefetchLoader(range(3))
+        self.assertEqual(list(loader), [0, 1, 2])
+
+        for _ in range(2):
+            with self.assertRaises(StopIteration):
+                next(loader)
+
+    def test_error_keeps_raising(self):
+        loader = MetaPrefetchLoader(FailingLoader())
+        self.assertEqual(next(loader), 0)
+
+        for _ in range(2):
+            with self.assertRaises(RuntimeError):
+                next(loader)
+
+
+if __name__ == '__main__':
+    unittest.main()